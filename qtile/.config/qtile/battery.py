@@ -0,0 +1,48 @@
+from bisect import bisect_left
+
+from libqtile.widget.battery import Battery, BatteryState
+
+
+class MyBattery(Battery):
+    """My custom battery widget."""
+
+    # discharging glyphs for charge up to, between and above these levels
+    _DISCHARGE_LEVELS = (0.45, 0.75)
+    _DISCHARGE_CHARS = (" ", " ", " ")
+    _STATE_CHARS = {BatteryState.FULL: " ", BatteryState.EMPTY: " "}
+    _CHARGING_CHAR = " "
+
+    def build_string(self, status):
+        """Build string for output."""
+        state = status.state
+        percent = status.percent
+        discharging = state == BatteryState.DISCHARGING
+        if self.layout is not None:
+            if discharging and percent < self.low_percentage:
+                self.layout.colour = self.low_foreground
+            else:
+                self.layout.colour = self.foreground
+        if discharging:
+            char = self._DISCHARGE_CHARS[bisect_left(self._DISCHARGE_LEVELS, percent)]
+        elif percent >= 1:
+            char = self._STATE_CHARS[BatteryState.FULL]
+        elif state in self._STATE_CHARS:
+            char = self._STATE_CHARS[state]
+        elif percent == 0:
+            char = self._STATE_CHARS[BatteryState.EMPTY]
+        else:
+            char = self._CHARGING_CHAR
+        if self.format == "{char}":
+            return char
+        return self.format.format(char=char, percent=percent)
+
+    def restore(self):
+        """Restore."""
+        self.format = "{char}"
+        self.timer_setup()
+
+    def button_press(self, x, y, button):
+        """Button press."""
+        self.format = "{percent:2.0%}"
+        self.timer_setup()
+        self.timeout_add(1, self.restore)
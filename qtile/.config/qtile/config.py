@@ -2,6 +2,9 @@
 
 import os
 import subprocess
+import threading
+import time
+from types import MappingProxyType, SimpleNamespace
 
 from libqtile import bar, hook, layout, qtile, widget
 from libqtile.config import (
@@ -16,19 +19,11 @@ from libqtile.config import (
     Screen,
 )
 from libqtile.lazy import lazy
-from libqtile.widget.battery import Battery, BatteryState
 from monitors import get_monitors
 from xmonad import MonadTall, MonadWide
 
-XDG_CONFIG_HOME = os.environ.get("XDG_CONFIG_HOME", os.environ["HOME"] + "/.config")
-
-
-def get_group(group_name):
-    """Get group by name."""
-    for group in groups:
-        if group.name == group_name:
-            return group
-    return None
+XDG_CONFIG_HOME = os.environ.get("XDG_CONFIG_HOME", os.path.join(os.environ["HOME"], ".config"))
+WALLPAPER = os.path.join(XDG_CONFIG_HOME, "qtile", "onedark.png")
 
 
 def toscreen(qtile, group_name):
@@ -38,21 +33,54 @@ def toscreen(qtile, group_name):
     if group is None:
         raise KeyError("Group does not exist", group_name)
 
-    screen_affinity = get_group(group_name).screen_affinity
+    screen_affinity = _affinity.get(group_name)
+    current_screen = qtile.current_screen
 
-    if qtile.current_screen.index != screen_affinity and screen_affinity is not None:
+    if screen_affinity is not None and current_screen.index != screen_affinity:
         qtile.cmd_to_screen(screen_affinity)
+        current_screen = qtile.current_screen
 
-    return qtile.current_screen.set_group(group)
+    return current_screen.set_group(group)
 
 
 def my_tasklist_parse(text):
-    if text.startswith("qute"):
-        text = text.split("]", 1)[0] + "]"
+    if text[:4] == "qute":
+        head, sep, _ = text.partition("]")
+        if sep:
+            return head + sep
 
     return text
 
 
+TIMETRACE_INTERVAL = 5
+TIMETRACE_TIMEOUT = 2
+# absorbs poll timer jitter so one bar's poll doesn't skip a refresh
+_TIMETRACE_JITTER = 0.1
+
+_timetrace_cache = {"time": 0.0, "status": ""}
+_timetrace_lock = threading.Lock()
+
+
+def timetrace_status():
+    """Get current timetrace project, shared by the bars of all screens."""
+    with _timetrace_lock:
+        now = time.monotonic()
+        if now - _timetrace_cache["time"] >= TIMETRACE_INTERVAL - _TIMETRACE_JITTER:
+            try:
+                _timetrace_cache["status"] = subprocess.run(
+                    ["timetrace", "status", "--format", "{project}"],
+                    capture_output=True,
+                    text=True,
+                    timeout=TIMETRACE_TIMEOUT,
+                ).stdout.rstrip("\n")
+            except subprocess.TimeoutExpired:
+                # keep showing the last status, raising would stop the widget's timer
+                pass
+            _timetrace_cache["time"] = now
+
+        return _timetrace_cache["status"]
+
+
 def group_or_app(qtile, group_name, app):
     """Go to specified group if it exists. Otherwise, run the specified app.
     When used in conjunction with dgroups to auto-assign apps to specific
@@ -65,6 +93,18 @@ def group_or_app(qtile, group_name, app):
         qtile.cmd_spawn(app)
 
 
+def gopass_pick(command):
+    """Pick a gopass entry with rofi and run the gopass command on it."""
+    return lazy.spawn(
+        [
+            "sh",
+            "-c",
+            'entry=$(gopass ls --flat | rofi -dmenu) && [ -n "$entry" ] && gopass '
+            + command.format('"$entry"'),
+        ]
+    )
+
+
 mod = "mod4"
 alt = "mod1"
 shift = "shift"
@@ -73,24 +113,24 @@ ctrl = "control"
 terminal = "kitty"
 editor = terminal + " zsh -i -c nvim"
 
-colors = {
-    "red": "#E06C75",
-    "dark_red": "#BE5046",
-    "green": "#98C379",
-    "yellow": "#E5C07B",
-    "dark_yellow": "#D19A66",
-    "blue": "#61AFEF",
-    "purple": "#C678DD",
-    "cyan": "#56B6C2",
-    "white": "#ABB2BF",
-    "dark_white": "#979EAB",
-    "black": "#282C34",
-    "comment_grey": "#5C6370",
-    "gutter_fg_grey": "#4B5263",
-    "cursor_grey": "#2C323C",
-    "special_grey": "#3B4048",
-    "vertsplit": "#21252B",
-}
+colors = SimpleNamespace(
+    red="#E06C75",
+    dark_red="#BE5046",
+    green="#98C379",
+    yellow="#E5C07B",
+    dark_yellow="#D19A66",
+    blue="#61AFEF",
+    purple="#C678DD",
+    cyan="#56B6C2",
+    white="#ABB2BF",
+    dark_white="#979EAB",
+    black="#282C34",
+    comment_grey="#5C6370",
+    gutter_fg_grey="#4B5263",
+    cursor_grey="#2C323C",
+    special_grey="#3B4048",
+    vertsplit="#21252B",
+)
 
 keys = [
     KeyChord(
@@ -191,35 +231,26 @@ keys = [
 
 groups = [Group(i) for i in "1234567890"]
 
-for i in groups:
-    keys.extend(
-        [
-            Key(
-                [mod],
-                i.name,
-                lazy.function(toscreen, i.name),
-                desc="Switch to group {}".format(i.name),
-            ),
-            Key(
-                [mod, ctrl],
-                i.name,
-                lazy.window.togroup(i.name, switch_group=False),
-                desc="Move current window to group {}".format(i.name),
-            ),
-            Key(
-                [mod, shift],
-                i.name,
-                lazy.window.togroup(i.name, switch_group=True),
-                desc="Move current window and switch to group {}".format(i.name),
-            ),
-            Key(
-                [mod, shift, ctrl],
-                i.name,
-                lazy.group.switch_groups(i.name),
-                desc="Move current group to {}".format(i.name),
-            ),
-        ]
-    )
+group_key_specs = [
+    ([mod], lambda name: lazy.function(toscreen, name), "Switch to group {}"),
+    (
+        [mod, ctrl],
+        lambda name: lazy.window.togroup(name, switch_group=False),
+        "Move current window to group {}",
+    ),
+    (
+        [mod, shift],
+        lambda name: lazy.window.togroup(name, switch_group=True),
+        "Move current window and switch to group {}",
+    ),
+    ([mod, shift, ctrl], lambda name: lazy.group.switch_groups(name), "Move current group to {}"),
+]
+
+keys += [
+    Key(mods, group.name, action(group.name), desc=desc.format(group.name))
+    for group in groups
+    for mods, action, desc in group_key_specs
+]
 
 groups.extend(
     [
@@ -286,6 +317,15 @@ groups.append(
     )
 )
 
+_affinity = {g.name: getattr(g, "screen_affinity", None) for g in groups}
+
+gopass_keys = [
+    Key([mod], "u", gopass_pick("show --clip {} username")),
+    Key([mod], "p", gopass_pick("show --clip {}")),
+    Key([mod], "o", gopass_pick("totp --clip {}")),
+    Key([mod], "a", gopass_pick("show --clip {} url")),
+]
+
 keys.extend(
     [
         # Key([mod], "s", lazy.group["chat"].toscreen()),
@@ -320,66 +360,15 @@ keys.extend(
                 Key([mod], "s", lazy.group["scratchpad"].dropdown_toggle("spotify")),
             ],
         ),
-        KeyChord(
-            [mod],
-            "z",
-            [
-                Key(
-                    [mod],
-                    "u",
-                    lazy.spawn(
-                        [
-                            "sh",
-                            "-c",
-                            "gopass ls --flat | rofi -dmenu | xargs --no-run-if-empty -I{} -r "
-                            "qtile cmd-obj -o cmd -f spawn -a 'gopass show --clip {} username'",
-                        ]
-                    ),
-                ),
-                Key(
-                    [mod],
-                    "p",
-                    lazy.spawn(
-                        [
-                            "sh",
-                            "-c",
-                            "gopass ls --flat | rofi -dmenu | xargs --no-run-if-empty -I{} -r "
-                            "qtile cmd-obj -o cmd -f spawn -a 'gopass show --clip {}'",
-                        ]
-                    ),
-                ),
-                Key(
-                    [mod],
-                    "o",
-                    lazy.spawn(
-                        [
-                            "sh",
-                            "-c",
-                            "gopass ls --flat | rofi -dmenu | xargs --no-run-if-empty -I{} -r "
-                            "qtile cmd-obj -o cmd -f spawn -a 'gopass totp --clip {}'",
-                        ]
-                    ),
-                ),
-                Key(
-                    [mod],
-                    "a",
-                    lazy.spawn(
-                        [
-                            "sh",
-                            "-c",
-                            "gopass ls --flat | rofi -dmenu | xargs --no-run-if-empty -I{} -r "
-                            "qtile cmd-obj -o cmd -f spawn -a 'gopass show --clip {} url'",
-                        ]
-                    ),
-                ),
-            ],
-        ),
+        KeyChord([mod], "z", gopass_keys),
     ]
 )
 
-layout_defaults = dict(
-    border_focus=colors["blue"],
-    border_normal=colors["comment_grey"],
+layout_defaults = MappingProxyType(
+    dict(
+        border_focus=colors.blue,
+        border_normal=colors.comment_grey,
+    )
 )
 
 layouts = [
@@ -387,88 +376,44 @@ layouts = [
     MonadWide(**layout_defaults),
 ]
 
-widget_defaults = dict(
-    font="MesloLGM Nerd Font",
-    fontsize=14,
-    padding=3,
-    foreground=colors["white"],
+widget_defaults = MappingProxyType(
+    dict(
+        font="MesloLGM Nerd Font",
+        fontsize=14,
+        padding=3,
+        foreground=colors.white,
+    )
 )
 
-extension_defaults = widget_defaults.copy()
-
-
-class MyBattery(Battery):
-    """My custom battery widget."""
-
-    def build_string(self, status):
-        """Build string for output."""
-        if self.layout is not None:
-            if status.state == BatteryState.DISCHARGING and status.percent < self.low_percentage:
-                self.layout.colour = self.low_foreground
-            else:
-                self.layout.colour = self.foreground
-        if status.state == BatteryState.DISCHARGING:
-            if status.percent > 0.75:
-                char = " "
-            elif status.percent > 0.45:
-                char = " "
-            else:
-                char = " "
-        elif status.percent >= 1 or status.state == BatteryState.FULL:
-            char = " "
-        elif status.state == BatteryState.EMPTY or status.percent == 0:
-            char = " "
-        else:
-            char = " "
-        return self.format.format(char=char, percent=status.percent)
-
-    def restore(self):
-        """Restore."""
-        self.format = "{char}"
-        self.font = widget_defaults.font
-        self.timer_setup()
-
-    def button_press(self, x, y, button):
-        """Button press."""
-        self.format = "{percent:2.0%}"
-        self.font = widget_defaults.font
-        self.timer_setup()
-        self.timeout_add(1, self.restore)
-
-
-battery = MyBattery(
-    format="{char}",
-    low_foreground=colors["red"],
-    show_short_text=False,
-    low_percentage=0.12,
-    foreground=colors["white"],
-    notify_below=12,
-)
+extension_defaults = widget_defaults
+
+_CHORDS_COLORS = {
+    "launch": (colors.red, colors.white),
+}
+_MARKUP_FOCUSED = f'<span foreground="{colors.blue}" weight="bold">{{}}</span>'
 
 
-def get_widgets():
+def get_widgets(extras=()):
     return [
         widget.CurrentLayoutIcon(scale=0.8),
         widget.GroupBox(
             highlight_method="block",
             rounded=False,
-            this_current_screen_border=colors["blue"],
-            other_screen_border=colors["dark_yellow"],
+            this_current_screen_border=colors.blue,
+            other_screen_border=colors.dark_yellow,
             hide_unused=True,
         ),
         widget.Chord(
-            chords_colors={
-                "launch": (colors["red"], colors["white"]),
-            },
-            name_transform=lambda name: name.upper(),
+            chords_colors=_CHORDS_COLORS,
+            name_transform=str.upper,
         ),
         widget.Prompt(),
         widget.Spacer(length=10),
         widget.TaskList(
             highlight_method="block",
-            border=colors["special_grey"],
+            border=colors.special_grey,
             unfocused_border="#353940",
-            foreground=colors["white"],
+            foreground=colors.white,
             icon_size=0,
             margin=0,
             title_width_method="uniform",
@@ -477,16 +422,15 @@ def get_widgets():
             txt_maximized="类 ",
             txt_floating="缾 ",
             parse_text=my_tasklist_parse,
-            markup_focused='<span foreground="' + colors["blue"] + '" weight="bold">{}</span>',
+            markup_focused=_MARKUP_FOCUSED,
         ),
         widget.Spacer(length=13),
+        *extras,
         widget.Spacer(length=5),
         widget.GenPollText(
             fmt="祥 {}",
-            func=lambda: subprocess.check_output(["timetrace", "status", "--format", "{project}"])
-            .decode("utf-8")
-            .replace("\n", ""),
-            update_interval=5,
+            func=timetrace_status,
+            update_interval=TIMETRACE_INTERVAL,
             mouse_callbacks={
                 "Button1": lazy.spawn("timetrace start hacon"),
                 "Button3": lazy.spawn("timetrace stop"),
@@ -496,26 +440,41 @@ def get_widgets():
     ]
 
 
+def get_bar(extras=()):
+    return bar.Bar(
+        get_widgets(extras),
+        26,
+        background=colors.black,
+        margin=2,
+    )
+
+
 screens = []
 monitors = get_monitors()
 if monitors is not None:
-    for monitor in monitors:
-        widgets = get_widgets()
+    if any(monitor["name"] == "eDP1" for monitor in monitors):
+        from battery import MyBattery
+
+        battery = MyBattery(
+            format="{char}",
+            low_foreground=colors.red,
+            show_short_text=False,
+            low_percentage=0.12,
+            foreground=colors.white,
+            notify_below=12,
+        )
 
+    for monitor in monitors:
+        extras = []
         if monitor["primary"]:
-            widgets.insert(-3, widget.Systray())
+            extras.append(widget.Systray())
         if monitor["name"] == "eDP1":
-            widgets.insert(-3, battery)
+            extras.append(battery)
 
         screens.append(
             Screen(
-                bar.Bar(
-                    widgets,
-                    26,
-                    background=colors["black"],
-                    margin=2,
-                ),
-                wallpaper=XDG_CONFIG_HOME + "/qtile/onedark.png",
+                get_bar(extras),
+                wallpaper=WALLPAPER,
                 wallpaper_mode="fill",
             )
         )
@@ -564,11 +523,30 @@ def autostart():
     ]
 
     for p in processes:
-        subprocess.Popen(p)
+        subprocess.Popen(
+            p,
+            close_fds=False,
+            start_new_session=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
 
 
-@hook.subscribe.screen_change
-def set_screens(event):
-    """Set screens."""
+_screen_change_timer = None
+
+
+def apply_screens():
+    """Apply monitor setup and restart."""
     subprocess.run(["autorandr", "--change"])
     qtile.restart()
+
+
+@hook.subscribe.screen_change
+def set_screens(event):
+    """Set screens once screen changes have settled."""
+    global _screen_change_timer
+
+    if _screen_change_timer is not None:
+        _screen_change_timer.cancel()
+    _screen_change_timer = qtile.call_later(1.5, apply_screens)
@@ -1,33 +1,32 @@
+import subprocess
 from typing import Dict, List
 
-from Xlib import display
-
 
 def get_monitors() -> List[Dict[str, bool]]:
     """Get monitors"""
 
     monitors = []
-    d = display.Display()
-    res = d.screen().root.xrandr_get_screen_resources()._data
-    primary = d.screen().root.xrandr_get_output_primary()._data
+    out = subprocess.check_output(["xrandr", "--listmonitors"], text=True)
 
-    for output in res["outputs"]:
-        mon = d.xrandr_get_output_info(output, res["config_timestamp"])._data
-        if mon["num_preferred"]:
-            if output == primary["output"]:
-                monitors.insert(
-                    0,
-                    {
-                        "name": mon["name"],
-                        "primary": True,
-                    },
-                )
-            else:
-                monitors.append(
-                    {
-                        "name": mon["name"],
-                        "primary": False,
-                    }
-                )
+    # skip the "Monitors: N" header, lines look like " 0: +*eDP1 1920/344x1080/193+0+0  eDP1"
+    for line in out.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        if parts[1].startswith("+*"):
+            monitors.insert(
+                0,
+                {
+                    "name": parts[-1],
+                    "primary": True,
+                },
+            )
+        else:
+            monitors.append(
+                {
+                    "name": parts[-1],
+                    "primary": False,
+                }
+            )
 
     return monitors
@@ -34,6 +34,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from itertools import islice
+
 from libqtile.layout.base import _SimpleLayoutBase
 
 
@@ -207,6 +209,9 @@ class MonadTall(_SimpleLayoutBase):
         if self.single_margin is None:
             self.single_margin = self.margin
         self.screen_rect = None
+        self._relayout_pending = False
+        self._master_margin_key = None
+        self._master_margin_cache = None
 
     @property
     def focused(self):
@@ -227,6 +232,7 @@ class MonadTall(_SimpleLayoutBase):
         c.ratio = self.ratio
         c.align = self.align
         c.orientation = self.orientation
+        c._relayout_pending = False
         return c
 
     def add(self, client):
@@ -239,11 +245,27 @@ class MonadTall(_SimpleLayoutBase):
         self.do_normalize = True
         return self.clients.remove(client)
 
+    def _request_relayout(self):
+        """Lay out the group once the current batch of commands is handled.
+
+        Repeated requests before the event loop gets back to us, e.g. from
+        a held resize key, collapse into a single ``layout_all``.
+        """
+        if self._relayout_pending:
+            return
+        self._relayout_pending = True
+        self.group.qtile.call_soon(self._relayout)
+
+    def _relayout(self):
+        self._relayout_pending = False
+        if self.group is not None:
+            self.group.layout_all()
+
     def cmd_normalize(self, redraw=True):
         "Evenly distribute screen-space between master and slave pane"
         if redraw:
             self.ratio = self._med_ratio
-            self.group.layout_all()
+            self._request_relayout()
         self.do_normalize = False
 
     def cmd_reset(self, redraw=True):
@@ -262,17 +284,16 @@ class MonadTall(_SimpleLayoutBase):
             self.maximized = False
         else:
             self.maximized = True
-        self.group.layout_all()
+        self._request_relayout()
 
     def configure(self, client, screen_rect):
         "Position client based on order and sizes"
         self.screen_rect = screen_rect
 
-        if self.do_normalize:
-            self.cmd_normalize(False)
-
         # if client not in this layout
-        if not self.clients or client not in self.clients:
+        try:
+            cidx = self.clients.index(client)
+        except ValueError:
             client.hide()
             return
 
@@ -295,39 +316,43 @@ class MonadTall(_SimpleLayoutBase):
                     margin=self.single_margin,
                 )
                 client.unhide()
-            else:
+            elif not client.hidden:
                 client.hide()
             return
 
-        cidx = self.clients.index(client)
+        if self.do_normalize:
+            self.cmd_normalize(False)
+
         self._configure_specific(client, screen_rect, px, cidx)
         client.unhide()
 
     def _configure_specific(self, client, screen_rect, px, cidx):
         """Specific configuration for xmonad tall."""
         self.screen_rect = screen_rect
+        is_master = cidx < self.master_length
+        n_slaves = max(len(self.clients) - self.master_length, 0)
 
         # calculate master/slave pane size
         width_master = int(self.screen_rect.width * self.ratio)
         width_slave = self.screen_rect.width - width_master
 
-        if len(self.master_windows) == 0:
+        if self.master_length == 0:
             width_master = 0
             width_slave = self.screen_rect.width
-        if len(self.slave_windows) == 0:
+        if n_slaves == 0:
             width_master = self.screen_rect.width
             width_slave = 0
 
         # calculate client's x offset
         if self.align == self._left:  # left or up orientation
-            if client in self.master_windows:
+            if is_master:
                 # master client
                 xpos = self.screen_rect.x
             else:
                 # slave client
                 xpos = self.screen_rect.x + width_master
         else:  # right or down orientation
-            if client in self.master_windows:
+            if is_master:
                 # master client
                 xpos = self.screen_rect.x + width_slave - self.margin
             else:
@@ -335,13 +360,13 @@ class MonadTall(_SimpleLayoutBase):
                 xpos = self.screen_rect.x
 
         # calculate client height and place
-        if client in self.slave_windows:
-            pos = self.clients.index(client)
+        if not is_master:
             # slave client
-            width = width_slave - 2 * self.border_width
+            borders = 2 * self.border_width
+            width = width_slave - borders
             # ypos is the sum of all clients above it
-            height = self.screen_rect.height // len(self.slave_windows)
-            ypos = self.screen_rect.y + self.clients[self.master_length :].index(client) * height
+            height = self.screen_rect.height // n_slaves
+            ypos = self.screen_rect.y + (cidx - self.master_length) * height
             # fix double margin
             if cidx > 1:
                 ypos -= self.margin
@@ -351,26 +376,25 @@ class MonadTall(_SimpleLayoutBase):
                 xpos,
                 ypos,
                 width,
-                height - 2 * self.border_width,
+                height - borders,
                 self.border_width,
                 px,
                 margin=self.margin,
             )
         else:
-            pos = self.clients.index(client)
             if self.orientation == self._vert:
                 height = self.screen_rect.height // self.master_length
                 width = width_master
-                ypos = self.screen_rect.y + pos * height
+                ypos = self.screen_rect.y + cidx * height
             else:
                 height = self.screen_rect.height
                 width = width_master // self.master_length
                 overflow = width_master % self.master_length
                 ypos = self.screen_rect.y
                 if self.align == self._left:
-                    xpos = self.screen_rect.x + pos * width + overflow
+                    xpos = self.screen_rect.x + cidx * width + overflow
                 else:
-                    xpos = self.screen_rect.x + width_slave + pos * width
+                    xpos = self.screen_rect.x + width_slave + cidx * width
 
             # master client
             client.place(
@@ -380,20 +404,27 @@ class MonadTall(_SimpleLayoutBase):
                 height,
                 self.border_width,
                 px,
-                margin=[
-                    self.margin,
-                    2 * self.border_width,
-                    self.margin + 2 * self.border_width,
-                    self.margin,
-                ],
+                margin=self._master_margin(),
             )
 
+    def _master_margin(self):
+        """Margin for master clients, rebuilt only if margin or border width change."""
+        key = (self.margin, self.border_width)
+        if self._master_margin_key != key:
+            self._master_margin_key = key
+            self._master_margin_cache = self._build_master_margin()
+        return self._master_margin_cache
+
+    def _build_master_margin(self):
+        borders = 2 * self.border_width
+        return [self.margin, borders, self.margin + borders, self.margin]
+
     def info(self):
         d = _SimpleLayoutBase.info(self)
         d.update(
             dict(
-                master=[c.name for c in self.master_windows],
-                slave=[c.name for c in self.slave_windows],
+                master=[c.name for c in islice(self.clients, self.master_length)],
+                slave=[c.name for c in islice(self.clients, self.master_length, None)],
             )
         )
         return d
@@ -410,7 +441,7 @@ class MonadTall(_SimpleLayoutBase):
         pane.
         """
         self._grow_master(self.change_ratio)
-        self.group.layout_all()
+        self._request_relayout()
 
     def cmd_shrink_master(self):
         """Shrink master pane
@@ -419,7 +450,7 @@ class MonadTall(_SimpleLayoutBase):
         slave pane.
         """
         self._shrink_master(self.change_ratio)
-        self.group.layout_all()
+        self._request_relayout()
 
     def _shrink_master(self, amt):
         """Will shrink the client that currently in the master pane"""
@@ -447,7 +478,7 @@ class MonadTall(_SimpleLayoutBase):
     def cmd_flip(self):
         """Flip the layout horizontally"""
         self.align = self._left if self.align == self._right else self._right
-        self.group.layout_all()
+        self._request_relayout()
 
     def cmd_swap(self, window1, window2):
         """Swap two windows"""
@@ -472,14 +503,14 @@ class MonadTall(_SimpleLayoutBase):
         self.master_length -= 1
         if self.master_length <= 0:
             self.master_length = 0
-        self.group.layout_all()
+        self._request_relayout()
 
     def cmd_increase_nmaster(self):
         """Increase number of windows in master pane"""
         self.master_length += 1
         if self.master_length >= len(self.clients):
             self.master_length = len(self.clients)
-        self.group.layout_all()
+        self._request_relayout()
 
     def cmd_master(self):
         """Focus windows in master pane"""
@@ -493,7 +524,7 @@ class MonadTall(_SimpleLayoutBase):
     def cmd_flip_master(self):
         """Flip the layout horizontally"""
         self.orientation = self._vert if self.orientation == self._hori else self._hori
-        self.group.layout_all()
+        self._request_relayout()
 
 
 class MonadWide(MonadTall):
@@ -607,31 +638,37 @@ class MonadWide(MonadTall):
     _hori = 0
     _vert = 1
 
+    def _build_master_margin(self):
+        borders = 2 * self.border_width
+        return [self.margin, self.margin + borders, borders, self.margin]
+
     def _configure_specific(self, client, screen_rect, px, cidx):
         """Specific configuration for xmonad wide."""
         self.screen_rect = screen_rect
+        is_master = cidx < self.master_length
+        n_slaves = max(len(self.clients) - self.master_length, 0)
 
         # calculate master/slave column widths
         height_master = int(self.screen_rect.height * self.ratio)
         height_slave = self.screen_rect.height - height_master
 
-        if len(self.master_windows) == 0:
+        if self.master_length == 0:
             height_master = 0
             height_slave = self.screen_rect.height
-        if len(self.slave_windows) == 0:
+        if n_slaves == 0:
             height_master = self.screen_rect.height
             height_slave = 0
 
         # calculate client's x offset
         if self.align == self._up:  # up orientation
-            if client in self.master_windows:
+            if is_master:
                 # master client
                 ypos = self.screen_rect.y
             else:
                 # slave client
                 ypos = self.screen_rect.y + height_master
         else:  # right or down orientation
-            if client in self.master_windows:
+            if is_master:
                 # master client
                 ypos = self.screen_rect.y + height_slave - self.margin
             else:
@@ -639,14 +676,13 @@ class MonadWide(MonadTall):
                 ypos = self.screen_rect.y
 
         # calculate client height and place
-        if client in self.slave_windows:
+        if not is_master:
             # slave client
-            height = height_slave - 2 * self.border_width
+            borders = 2 * self.border_width
+            height = height_slave - borders
             # xpos is the sum of all clients left of it
-            width = self.screen_rect.width // len(self.slave_windows)
-            xpos = self.screen_rect.x + self.clients[self.master_length :].index(client) * width
-            # get width from precalculated width list
-            width = self.screen_rect.width // len(self.slave_windows)
+            width = self.screen_rect.width // n_slaves
+            xpos = self.screen_rect.x + (cidx - self.master_length) * width
 
             # fix double margin
             if cidx > 1:
@@ -656,27 +692,26 @@ class MonadWide(MonadTall):
             client.place(
                 xpos,
                 ypos,
-                width - 2 * self.border_width,
+                width - borders,
                 height,
                 self.border_width,
                 px,
                 margin=self.margin,
             )
         else:
-            pos = self.clients.index(client)
             if self.orientation == self._hori:
                 width = self.screen_rect.width // self.master_length
                 height = height_master
-                xpos = self.screen_rect.x + pos * width
+                xpos = self.screen_rect.x + cidx * width
             else:
                 width = self.screen_rect.width
                 height = height_master // self.master_length
                 overflow = height_master % self.master_length
                 xpos = self.screen_rect.x
                 if self.align == self._up:
-                    ypos = self.screen_rect.y + pos * height + overflow
+                    ypos = self.screen_rect.y + cidx * height + overflow
                 else:
-                    ypos = self.screen_rect.y + height_slave + pos * height
+                    ypos = self.screen_rect.y + height_slave + cidx * height
 
             # master client
             client.place(
@@ -686,10 +721,5 @@ class MonadWide(MonadTall):
                 height,
                 self.border_width,
                 px,
-                margin=[
-                    self.margin,
-                    self.margin + 2 * self.border_width,
-                    2 * self.border_width,
-                    self.margin,
-                ],
+                margin=self._master_margin(),
             )